@@ -1,16 +1,10 @@
 import streamlit as st
-import tensorflow as tf
 import numpy as np
 from PIL import Image
-from tensorflow.keras.applications.efficientnet import preprocess_input
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import letter
-import tempfile
+import hashlib
+import io
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 import gdown
 
@@ -20,7 +14,27 @@ FILE_ID = os.getenv("TOMATO_MODEL_ID")
 if not FILE_ID:
     st.error("Model ID not found. Please set TOMATO_MODEL_ID in Streamlit Secrets.")
     st.stop()
-MODEL_PATH = "model.keras"
+# Optional sha256 of model.keras; when set, a corrupt or stale download
+# is detected and re-fetched instead of crashing at load time.
+MODEL_SHA256 = os.getenv("TOMATO_MODEL_SHA256")
+
+# Downloads and on-host conversions live outside the app directory so
+# warm container restarts skip the ~100MB fetch.
+CACHE_DIR = Path.home() / ".cache" / "agroscan"
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def _model_path(name):
+    # Artifacts deployed next to the app win; everything else goes to
+    # the persistent cache directory.
+    return name if os.path.exists(name) else str(CACHE_DIR / name)
+
+
+MODEL_PATH = _model_path("model.keras")
+TFLITE_PATH = _model_path("model.tflite")
+TFLITE_INT8_PATH = _model_path("model_int8.tflite")
+ONNX_PATH = _model_path("model.onnx")
+ONNX_INT8_PATH = _model_path("model.int8.onnx")
 
 # -----------------------
 # PAGE CONFIG
@@ -96,6 +110,25 @@ language = st.sidebar.selectbox(
 
 st.session_state.lang = language
 T = translations[language]
+
+
+# Static halves of the disease cards, rebuilt only on language change;
+# reruns just append the confidence line.
+@st.cache_data
+def card_templates(lang):
+    t = translations[lang]
+    primary = {
+        d: f'<div class="glass-card primary-disease"><h2>{t["primary"]}</h2><h1>{d}</h1>'
+        for d in label_columns
+    }
+    secondary = {
+        d: f'<div class="glass-card secondary-disease"><h4>{d}</h4>'
+        for d in label_columns
+    }
+    return primary, secondary
+
+
+PRIMARY_CARDS, SECONDARY_CARDS = card_templates(language)
 # -----------------------
 # DISEASE INFO DATABASE
 # -----------------------
@@ -145,57 +178,267 @@ disease_info = {
 # -----------------------
 # LOAD MODEL
 # -----------------------
+def _make_interpreter(model_path):
+    # The interpreter defaults to a single thread; spread the conv
+    # kernels over the physical cores (os.cpu_count reports
+    # hyperthreads), with a floor of 2 for Streamlit Cloud's 2 vCPUs.
+    num_threads = max(2, (os.cpu_count() or 2) // 2)
+    # Prefer the slim tflite_runtime with an explicit XNNPACK delegate so
+    # int8 convs hit the optimized VNNI/dotprod kernels; fall back to the
+    # TF-bundled interpreter (which ships XNNPACK built in).
+    try:
+        from tflite_runtime.interpreter import Interpreter, load_delegate
+    except ImportError:
+        import tensorflow as tf
+
+        return tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+    try:
+        delegate = load_delegate("libxnnpack.so", {"num_threads": num_threads})
+        return Interpreter(model_path=model_path, experimental_delegates=[delegate])
+    except (OSError, ValueError):
+        return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+def _keras_fallback():
+    # Last resort when TFLite conversion is unavailable on the host.
+    # A cached concrete function skips model.predict's per-call loop and
+    # callback machinery, which dominates at batch=1.
+    import tensorflow as tf
+
+    keras_model = tf.keras.models.load_model(MODEL_PATH)
+    size = keras_model.input_shape[1] or IMG_SIZE
+
+    @tf.function(input_signature=[tf.TensorSpec((1, size, size, 3), tf.float32)])
+    def infer(x):
+        return keras_model(x, training=False)
+
+    infer.get_concrete_function()
+    return "keras", infer
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _model_ok():
+    if not os.path.exists(MODEL_PATH):
+        return False
+    return MODEL_SHA256 is None or _sha256(MODEL_PATH) == MODEL_SHA256
+
+
+def _download_model():
+    url = f"https://drive.google.com/uc?id={FILE_ID}"
+    with st.status("Downloading model..."):
+        # resume=True picks up partial downloads left by killed workers.
+        gdown.download(url, MODEL_PATH, quiet=False, resume=True)
+    if MODEL_SHA256 and _sha256(MODEL_PATH) != MODEL_SHA256:
+        os.remove(MODEL_PATH)
+        st.error("Downloaded model failed checksum verification.")
+        st.stop()
+
+
+def _make_onnx_session(model_path):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(
+        model_path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+
+def _load_backend():
+    # onnxruntime's int8 kernels beat TFLite's on the x86 hosts Streamlit
+    # Cloud runs on, so an ONNX export (convert_model.py --onnx) deployed
+    # next to the app wins over everything else.
+    for onnx_path in (ONNX_INT8_PATH, ONNX_PATH):
+        if os.path.exists(onnx_path):
+            try:
+                return "onnx", _make_onnx_session(onnx_path)
+            except ImportError:
+                break
+    # A fully int8-quantized model (see convert_model.py --int8) takes
+    # priority over the float16 one when deployed alongside the app.
+    if os.path.exists(TFLITE_INT8_PATH):
+        interpreter = _make_interpreter(TFLITE_INT8_PATH)
+        interpreter.allocate_tensors()
+        return "tflite", interpreter
+    if not os.path.exists(TFLITE_PATH):
+        from convert_model import convert_to_tflite
+
+        if not _model_ok():
+            _download_model()
+        try:
+            convert_to_tflite(MODEL_PATH, TFLITE_PATH)
+        except Exception:
+            return _keras_fallback()
+    interpreter = _make_interpreter(TFLITE_PATH)
+    interpreter.allocate_tensors()
+    return "tflite", interpreter
+
+
+def _input_size(kind, runner):
+    # Read the expected resolution off the loaded model, so a lighter
+    # retrain (e.g. EfficientNet-Lite at 224x224) drops in with no code
+    # change; None means the model does not pin a size.
+    try:
+        if kind == "keras":
+            shape = runner.input_signature[0].shape
+        elif kind == "onnx":
+            shape = runner.get_inputs()[0].shape
+        else:
+            shape = runner.get_input_details()[0]["shape"]
+        size = int(shape[1])
+        return size if size > 0 else None
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _warm_up(kind, runner):
+    # Dummy forward pass so kernel selection/caching happens at app
+    # start instead of on the first user's upload.
+    size = _input_size(kind, runner) or IMG_SIZE
+    if kind == "keras":
+        runner(np.zeros((1, size, size, 3), dtype=np.float32))
+        return
+    if kind == "onnx":
+        dummy = np.zeros((1, size, size, 3), dtype=np.float32)
+        runner.run(None, {runner.get_inputs()[0].name: dummy})
+        return
+    details = runner.get_input_details()[0]
+    runner.set_tensor(details["index"], np.zeros(details["shape"], dtype=details["dtype"]))
+    runner.invoke()
+
+
 @st.cache_resource
 def load_model():
-    if not os.path.exists(MODEL_PATH):
-        url = f"https://drive.google.com/uc?id={FILE_ID}"
-        gdown.download(url, MODEL_PATH, quiet=False)
-    return tf.keras.models.load_model(MODEL_PATH)
+    kind, runner = _load_backend()
+    _warm_up(kind, runner)
+    return kind, runner
 
-model = load_model()
+backend, runner = load_model()
+IMG_SIZE = _input_size(backend, runner) or IMG_SIZE
 
 # -----------------------
 # PREDICTION FUNCTION
 # -----------------------
-def predict_image(img):
-    img = img.resize((IMG_SIZE, IMG_SIZE))
-    img_array = np.array(img)
-    img_array = preprocess_input(img_array)
-    img_array = np.expand_dims(img_array, axis=0)
-
-    preds = model.predict(img_array, verbose=0)[0]
-
-    results = []
-    for i, prob in enumerate(preds):
-        if prob > THRESHOLD:
-            results.append((label_columns[i], float(prob)))
-
-    results.sort(key=lambda x: x[1], reverse=True)
-    return results
+def _input_buffer():
+    # Per-session scratch buffer: each prediction skips a ~1MB float32
+    # allocation, and concurrent sessions on one worker get their own
+    # instead of racing on a shared module-level array.
+    buf = st.session_state.get("_input_buf")
+    if buf is None or buf.shape[1] != IMG_SIZE:
+        buf = np.empty((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+        st.session_state["_input_buf"] = buf
+    return buf
+
+
+def _decode_image(img_bytes):
+    # Decode and resize inside TF's C++/SIMD kernels rather than PIL's
+    # Python-side path; INTEGER_FAST trades invisible DCT precision for
+    # a faster JPEG decode.
+    import tensorflow as tf
+
+    try:
+        if img_bytes[:3] == b"\xff\xd8\xff":
+            img = tf.io.decode_jpeg(img_bytes, channels=3, dct_method="INTEGER_FAST")
+        else:
+            img = tf.io.decode_png(img_bytes, channels=3)
+        return tf.image.resize(img, (IMG_SIZE, IMG_SIZE), method="bilinear").numpy()
+    except tf.errors.InvalidArgumentError:
+        img = Image.open(io.BytesIO(img_bytes))
+        img = img.convert("RGB").resize((IMG_SIZE, IMG_SIZE), Image.BILINEAR)
+        return np.asarray(img, dtype=np.float32)
+
+
+# Keyed on the uploaded bytes, so UI-only reruns (language toggle,
+# PDF checkbox, expanders) never re-run the CNN.
+@st.cache_data(show_spinner=False)
+def run_inference(img_bytes):
+    # EfficientNet embeds its normalization layers in the model, so
+    # keras' preprocess_input is an identity here; raw float32 pixels
+    # go in directly.
+    img_array = _input_buffer()
+    np.copyto(img_array[0], _decode_image(img_bytes), casting="unsafe")
+
+    if backend == "keras":
+        preds = runner(img_array)[0].numpy()
+    elif backend == "onnx":
+        preds = runner.run(None, {runner.get_inputs()[0].name: img_array})[0][0]
+    else:
+        input_details = runner.get_input_details()[0]
+        output_details = runner.get_output_details()[0]
+
+        if input_details["dtype"] == np.int8:
+            scale, zero_point = input_details["quantization"]
+            img_array = np.round(img_array / scale + zero_point).astype(np.int8)
+
+        runner.set_tensor(input_details["index"], img_array)
+        runner.invoke()
+        preds = runner.get_tensor(output_details["index"])[0]
+
+        if output_details["dtype"] == np.int8:
+            scale, zero_point = output_details["quantization"]
+            preds = (preds.astype(np.float32) - zero_point) * scale
+
+    sel = np.nonzero(preds > THRESHOLD)[0]
+    sel = sel[np.argsort(preds[sel])[::-1]]
+    return [(label_columns[i], float(preds[i])) for i in sel]
 
 
 # -----------------------
 # PDF GENERATION
 # -----------------------
-def generate_pdf(predictions):
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-    elements = []
+# reportlab stays out of the cold-start import graph: it only loads on
+# the first PDF request, and the pre-rendered flowables for the fixed
+# label set are cached so later reports just format the confidence line.
+@st.cache_resource
+def _pdf_assets():
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, Spacer
+
     styles = getSampleStyleSheet()
+    header = [
+        Paragraph("Tomato Disease Detection Report", styles["Title"]),
+        Spacer(1, 0.5 * inch),
+    ]
+    cards = {
+        disease: [
+            Paragraph(f"Disease: {disease}", styles["Heading2"]),
+            Paragraph(f"Info: {info['info']}", styles["Normal"]),
+            Paragraph(f"Treatment: {info['treatment']}", styles["Normal"]),
+            Paragraph(f"Spray Suggestion: {info['spray']}", styles["Normal"]),
+        ]
+        for disease, info in disease_info.items()
+    }
+    return styles, header, cards
+
 
-    elements.append(Paragraph("Tomato Disease Detection Report", styles["Title"]))
-    elements.append(Spacer(1, 0.5 * inch))
+@st.cache_data(show_spinner=False)
+def generate_pdf(predictions):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    styles, header, cards = _pdf_assets()
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=letter)
+    elements = list(header)
 
     for disease, prob in predictions:
-        elements.append(Paragraph(f"Disease: {disease}", styles["Heading2"]))
+        card = cards[disease]
+        elements.append(card[0])
         elements.append(Paragraph(f"Confidence: {prob*100:.2f}%", styles["Normal"]))
-        elements.append(Paragraph(f"Info: {disease_info[disease]['info']}", styles["Normal"]))
-        elements.append(Paragraph(f"Treatment: {disease_info[disease]['treatment']}", styles["Normal"]))
-        elements.append(Paragraph(f"Spray Suggestion: {disease_info[disease]['spray']}", styles["Normal"]))
+        elements.extend(card[1:])
         elements.append(Spacer(1, 0.3 * inch))
 
     doc.build(elements)
-    return temp_file.name
+    return buf.getvalue()
 
 st.markdown("""
 <div style="
@@ -230,22 +473,26 @@ uploaded_file = st.file_uploader(
 
 
 if uploaded_file is not None:
-    image = Image.open(uploaded_file)
+    raw = uploaded_file.getvalue()
+    # Image.open only parses the header here (PIL decodes lazily), so
+    # the resolution check costs no rasterization; st.image gets the
+    # original bytes and skips the PIL->PNG re-encode entirely.
+    orig_width, orig_height = Image.open(io.BytesIO(raw)).size
     col1, col2 = st.columns([1.1, 1])
 
     with col1:
-        st.image(image, use_container_width=True)
+        st.image(raw, use_container_width=True)
         st.caption(T["uploaded_caption"])
 
     with col2:
 
         # Resolution validation first
-        if image.size[0] < 200 or image.size[1] < 200:
+        if orig_width < 200 or orig_height < 200:
             st.error("Please upload a clear high-resolution tomato leaf image.")
             st.stop()
 
         with st.spinner(T["analyzing"]):
-            predictions = predict_image(image)
+            predictions = run_inference(raw)
 
         if not predictions:
             st.info("No disease detected with sufficient confidence.")
@@ -267,15 +514,9 @@ if uploaded_file is not None:
         )  
 
         st.markdown(
-            f"""
-            <div class="glass-card primary-disease">
-                <h2>{T['primary']}</h2>
-                <h1>{primary[0]}</h1>
-                <h3 style="color:{confidence_color}; font-weight:600;">
-                    {primary[1]*100:.2f}% {T['confidence']}
-                </h3>
-            </div>
-            """,
+            PRIMARY_CARDS[primary[0]]
+            + f'<h3 style="color:{confidence_color}; font-weight:600;">'
+            + f'{primary[1]*100:.2f}% {T["confidence"]}</h3></div>',
             unsafe_allow_html=True
         )
 
@@ -294,42 +535,38 @@ if uploaded_file is not None:
         if secondary:
             st.markdown(f"### {T['secondary']}")
 
-            for disease, prob in secondary:
-
-                # Secondary Card
-                st.markdown(
-                    f"""
-                    <div class="glass-card secondary-disease">
-                        <h4>{disease}</h4>
-                        <p>{prob*100:.2f}% {T['confidence']}</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+            # One element for all cards: a single Streamlit protocol
+            # message instead of one round-trip per disease.
+            cards_html = "".join(
+                SECONDARY_CARDS[disease]
+                + f'<p>{prob*100:.2f}% {T["confidence"]}</p></div>'
+                for disease, prob in secondary
+            )
+            st.markdown(cards_html, unsafe_allow_html=True)
 
-                # Expandable Info for EACH secondary
-                with st.expander(f"{T['more_about']} {disease}", expanded=False):
+            # Details on demand for the selected disease only
+            choice = st.selectbox(T["more_about"], [d for d, _ in secondary])
+            with st.expander(f"{T['more_about']} {choice}", expanded=False):
 
-                    st.markdown(f"### {T['description']}")
-                    st.write(disease_info[disease]["info"])
+                st.markdown(f"### {T['description']}")
+                st.write(disease_info[choice]["info"])
 
-                    st.markdown(f"### {T['treatment']}")
-                    st.write(disease_info[disease]["treatment"])
+                st.markdown(f"### {T['treatment']}")
+                st.write(disease_info[choice]["treatment"])
 
-                    st.markdown(f"### {T['spray']}")
-                    st.write(disease_info[disease]["spray"])
+                st.markdown(f"### {T['spray']}")
+                st.write(disease_info[choice]["spray"])
 
 
         # -------- PDF --------
         if st.checkbox(T["download"]):
-            pdf_path = generate_pdf(predictions)
-            with open(pdf_path, "rb") as f:
-                st.download_button(
-                    label=T["download_btn"],
-                    data=f,
-                    file_name="Tomato_Disease_Report.pdf",
-                    mime="application/pdf"
-                )
+            pdf_bytes = generate_pdf(predictions)
+            st.download_button(
+                label=T["download_btn"],
+                data=pdf_bytes,
+                file_name="Tomato_Disease_Report.pdf",
+                mime="application/pdf"
+            )
 
 
 st.markdown("""
@@ -0,0 +1,107 @@
+"""Offline conversion of the trained Keras model to a TFLite FlatBuffer.
+
+Run once after training (or after downloading model.keras):
+
+    python convert_model.py [path/to/model.keras]
+
+Float16 post-training quantization halves the weight size, which roughly
+halves RAM use on Streamlit Cloud, while activations stay FP32 so the
+model remains compatible with GPU delegates.
+
+For full-integer quantization (2-4x faster conv/matmul on CPUs with
+int8 dot-product instructions), pass a directory of ~100 representative
+tomato leaf images used to calibrate activation ranges:
+
+    python convert_model.py model.keras --int8 path/to/rep_images
+
+For x86 deployments (Streamlit Cloud runs on Intel CPUs, where TFLite's
+quantized kernels underperform) export to ONNX with dynamic int8 weight
+quantization instead (requires tf2onnx and onnxruntime):
+
+    python convert_model.py model.keras --onnx
+"""
+
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+KERAS_PATH = "model.keras"
+TFLITE_PATH = "model.tflite"
+TFLITE_INT8_PATH = "model_int8.tflite"
+ONNX_PATH = "model.onnx"
+ONNX_INT8_PATH = "model.int8.onnx"
+
+# Fallback when the model does not pin an input resolution. The app
+# itself reads the size off the converted model, so a lighter retrain
+# (EfficientNet-Lite0/Lite2 at 224x224, fine-tuned in the training
+# notebook) converts and deploys through here unchanged.
+IMG_SIZE = 300
+
+
+def convert_to_tflite(keras_path=KERAS_PATH, tflite_path=TFLITE_PATH):
+    model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    tflite_model = converter.convert()
+    with open(tflite_path, "wb") as f:
+        f.write(tflite_model)
+    return tflite_path
+
+
+def _representative_dataset(image_dir, size, limit=100):
+    def gen():
+        count = 0
+        for name in sorted(os.listdir(image_dir)):
+            if count >= limit:
+                break
+            path = os.path.join(image_dir, name)
+            try:
+                img = Image.open(path).convert("RGB").resize((size, size))
+            except OSError:
+                continue
+            arr = np.asarray(img, dtype=np.float32)[np.newaxis]
+            yield [arr]
+            count += 1
+    return gen
+
+
+def convert_to_tflite_int8(image_dir, keras_path=KERAS_PATH,
+                           tflite_path=TFLITE_INT8_PATH):
+    model = tf.keras.models.load_model(keras_path)
+    size = model.input_shape[1] or IMG_SIZE
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = _representative_dataset(image_dir, size)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+    with open(tflite_path, "wb") as f:
+        f.write(tflite_model)
+    return tflite_path
+
+
+def convert_to_onnx(keras_path=KERAS_PATH, onnx_path=ONNX_PATH,
+                    int8_path=ONNX_INT8_PATH):
+    import tf2onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model = tf.keras.models.load_model(keras_path)
+    tf2onnx.convert.from_keras(model, opset=13, output_path=onnx_path)
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+if __name__ == "__main__":
+    keras_path = sys.argv[1] if len(sys.argv) > 1 else KERAS_PATH
+    if "--int8" in sys.argv:
+        image_dir = sys.argv[sys.argv.index("--int8") + 1]
+        print(f"Saved {convert_to_tflite_int8(image_dir, keras_path)}")
+    elif "--onnx" in sys.argv:
+        print(f"Saved {convert_to_onnx(keras_path)}")
+    else:
+        print(f"Saved {convert_to_tflite(keras_path)}")